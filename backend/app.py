@@ -4,12 +4,26 @@ With Perplexity AI Integration for Real-time Market Data
 """
 import os
 import sys
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
 from pathlib import Path
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 import pandas as pd
 import numpy as np
-import json
+import orjson
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional - fall back to plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
 
 # Load environment variables
 from dotenv import load_dotenv
@@ -21,11 +35,12 @@ sys.path.insert(0, str(Path(__file__).parent / 'src'))
 from src.data_processing import (
     prepare_prediction_input, 
     get_city_crime_score, 
+    get_city_crime_scores_batch,
     CITY_CRIME_INDEX,
     prepare_training_data
 )
 from src.model_training import HousePriceModel
-from src.explainer import ModelExplainer, get_similar_properties, compare_to_market
+from src.explainer import ModelExplainer, SimilarityIndex, get_similar_properties, compare_to_market
 from src.ai_integration import perplexity_ai
 
 # Paths
@@ -38,22 +53,89 @@ app = Flask(__name__,
             static_url_path='/assets')
 CORS(app)
 
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, which also serializes NumPy values natively"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        ).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+app.json = ORJSONProvider(app)
+
+
+def safe_endpoint(view):
+    """Log unexpected errors in an API view and answer with a generic 500"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            return view(*args, **kwargs)
+        except HTTPException:
+            raise
+        except Exception:
+            app.logger.exception("Unhandled error in %s", request.path)
+            return jsonify({'error': 'Internal server error'}), 500
+    
+    return wrapper
+
+
+@app.errorhandler(HTTPException)
+def handle_http_exception(e):
+    """Answer HTTP errors under /api/ (e.g. malformed JSON) with JSON like every other API error"""
+    if request.path.startswith('/api/'):
+        return jsonify({'error': e.description}), e.code
+    return e
+
 # Global variables for model and data
 model = None
 explainer = None
+similarity_index = None
 X_train = None
 y_train = None
 feature_names = None
+stats_cache = None
+feature_importance_json = None
+
+# Bumped on every (re)load so cached responses from an older model are never served
+MODEL_VERSION = 0
+RESPONSE_CACHE_SIZE = 4096
+MAX_BATCH_SIZE = 1000
+
+# Request-time encodings (mirror engineer_features in src/data_processing.py)
+BINARY_COLS = ('mainroad', 'guestroom', 'basement', 'hotwaterheating',
+               'airconditioning', 'prefarea')
+# Accepts 'yes'/'no' strings, JSON booleans and 0/1; anything else encodes as 0
+BINARY_MAP = {'yes': 1, 'no': 0, True: 1, False: 0}
+FURNISH_MAP = {'unfurnished': 0, 'semi-furnished': 1, 'furnished': 2}
+
+# Features computed by _fe_kernel, in kernel output order
+KERNEL_FEATURES = ('area', 'bedrooms', 'bathrooms') + BINARY_COLS + (
+    'bedroom_ratio', 'bathroom_ratio', 'total_rooms', 'amenity_score', 'furnishing_score')
+
+# Column positions, filled in by load_model()
+FEATURE_IDX = {}
+KERNEL_IDX = np.full(len(KERNEL_FEATURES), -1, dtype=np.int64)
+PASSTHROUGH_FEATURES = []
+
+# Training-set median of each model feature (model order), used as compare() defaults
+TRAIN_MEDIANS = None
 
 # Paths
 BASE_PATH = Path(__file__).parent
-MODEL_PATH = BASE_PATH / 'models' / 'house_price_model.joblib'
+MODEL_PATH = BASE_PATH / 'models' / 'house_price_model.json'
 DATA_PATH = BASE_PATH / 'data' / 'raw' / 'Housing (1).csv'
 
 
 def load_model():
     """Load trained model or train if not exists"""
-    global model, explainer, X_train, y_train, feature_names
+    global model, explainer, similarity_index, X_train, y_train, feature_names, stats_cache, MODEL_VERSION
+    global feature_importance_json
+    global FEATURE_IDX, KERNEL_IDX, PASSTHROUGH_FEATURES, TRAIN_MEDIANS
     
     # Prepare training data
     print("Loading training data...")
@@ -71,22 +153,213 @@ def load_model():
         model.train(X_train, y_train)
         model.save(str(MODEL_PATH))
     
+    FEATURE_IDX = {name: i for i, name in enumerate(model.feature_names)}
+    KERNEL_IDX = np.array([FEATURE_IDX.get(name, -1) for name in KERNEL_FEATURES], dtype=np.int64)
+    PASSTHROUGH_FEATURES = [name for name in model.feature_names if name not in KERNEL_FEATURES]
+    TRAIN_MEDIANS = (X_train.reindex(columns=model.feature_names).median()
+                     .fillna(0).to_numpy(dtype=np.float32))
+    
+    # Warm up once here (JIT compile, first booster call) instead of on the first request
+    model.predict(_prepare_features({}))
+    
     # Setup explainer
     print("Setting up explainer...")
     explainer = ModelExplainer(model)
-    explainer.setup(X_train)
+    explainer.setup()
     
+    # Scaler + nearest-neighbour index for /api/compare, fitted once
+    similarity_index = SimilarityIndex(X_train, y_train)
+    
+    # Dataset statistics are fixed once the model is loaded
+    stats_cache = compute_stats()
+    feature_importance_json = orjson.dumps(
+        compute_feature_importance(), option=orjson.OPT_SERIALIZE_NUMPY
+    )
+    
+    MODEL_VERSION += 1
     print("Model ready!")
 
 
+def compute_stats() -> dict:
+    """Compute dataset statistics served by /api/stats"""
+    return {
+        'total_properties': len(y_train),
+        'price_range': {
+            'min': y_train.min(),
+            'max': y_train.max(),
+            'mean': y_train.mean(),
+            'median': y_train.median()
+        },
+        'features': {
+            feat: {
+                'min': X_train[feat].min(),
+                'max': X_train[feat].max(),
+                'mean': X_train[feat].mean()
+            }
+            for feat in ['area', 'bedrooms', 'bathrooms'] 
+            if feat in X_train.columns
+        },
+        'model_metrics': model.metrics.get('individual_models', {}).get('ensemble', {})
+    }
+
+
+def compute_feature_importance() -> dict:
+    """Compute the feature importance payload served by /api/feature-importance"""
+    importance = model.get_feature_importance()
+    
+    # Get average importance sorted
+    avg_importance = importance.get('average', {})
+    sorted_importance = dict(sorted(
+        avg_importance.items(),
+        key=lambda x: x[1],
+        reverse=True
+    ))
+    
+    return {
+        'feature_importance': sorted_importance,
+        'model_specific': importance
+    }
+
+
+class ResponseCache:
+    """Thread-safe LRU of endpoint response dicts"""
+    
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def cache_key(data: dict) -> tuple:
+    """Canonical cache key for a request payload under the current model"""
+    # Sorted keys make logically identical requests share one cache entry; storing
+    # a fixed-size digest keeps large request bodies out of the cache
+    canonical = orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(canonical, digest_size=16).digest(), MODEL_VERSION
+
+
+def memoize_response(core):
+    """Cache an endpoint's response dict on the canonical JSON of its input"""
+    cache = ResponseCache()
+    
+    @wraps(core)
+    def wrapper(data: dict) -> dict:
+        key = cache_key(data)
+        response = cache.get(key)
+        if response is None:
+            response = core(data)
+            cache.put(key, response)
+        return response
+    
+    wrapper.cache = cache
+    return wrapper
+
+
+@njit(cache=True)
+def _put(out, idx, value):
+    """Write value to out[idx] unless the column is unused or the value is missing (NaN)"""
+    if idx >= 0 and not np.isnan(value):
+        out[idx] = value
+
+
+@njit(cache=True)
+def _fe_kernel(area, bedrooms, bathrooms, mainroad, guestroom, basement,
+               hotwaterheating, airconditioning, prefarea, furnishing_code, idx, out):
+    """Engineer features from scalar inputs into out; NaN marks a missing input"""
+    binaries = (mainroad, guestroom, basement, hotwaterheating, airconditioning, prefarea)
+    
+    _put(out, idx[0], area)
+    _put(out, idx[1], bedrooms)
+    _put(out, idx[2], bathrooms)
+    
+    amenity_score = np.nan
+    for k in range(6):
+        value = binaries[k]
+        _put(out, idx[3 + k], value)
+        if not np.isnan(value):
+            amenity_score = value if np.isnan(amenity_score) else amenity_score + value
+    
+    # Derived room features
+    if area != 0:
+        _put(out, idx[9], bedrooms / area * 1000)
+    _put(out, idx[10], bathrooms / (bedrooms if bedrooms != 0 else 1))
+    _put(out, idx[11], bedrooms + bathrooms)
+    
+    _put(out, idx[12], amenity_score)
+    _put(out, idx[13], furnishing_code)
+
+
+def fill_feature_row(data: dict, out: np.ndarray) -> np.ndarray:
+    """Encode raw property input into a zeroed 1-D row in model column order"""
+    nan = np.nan
+    binaries = [float(BINARY_MAP.get(data[col], 0)) if col in data else nan for col in BINARY_COLS]
+    furnishing_code = (FURNISH_MAP.get(data['furnishingstatus'], 1)
+                       if 'furnishingstatus' in data else nan)
+    
+    _fe_kernel(float(data.get('area', nan)), float(data.get('bedrooms', nan)),
+               float(data.get('bathrooms', nan)), *binaries, float(furnishing_code),
+               KERNEL_IDX, out)
+    
+    # Remaining model features are copied through as-is
+    for name in PASSTHROUGH_FEATURES:
+        if name in data:
+            out[FEATURE_IDX[name]] = data[name]
+    return out
+
+
+def _prepare_features(data: dict, defaults: np.ndarray = None) -> np.ndarray:
+    """Encode raw property input into a (1, n_features) row in model column order"""
+    # Features not present in the input take their default (0 unless given)
+    if defaults is None:
+        row = np.zeros((1, len(FEATURE_IDX)), dtype=np.float32)
+    else:
+        row = np.array(defaults, dtype=np.float32).reshape(1, -1)
+    fill_feature_row(data, row[0])
+    return row
+
+
+def _feature_frame(row: np.ndarray) -> pd.DataFrame:
+    """Labelled DataFrame view of a feature row, for consumers that need column names"""
+    return pd.DataFrame(row, columns=model.feature_names, copy=False)
+
+
+
+
+def _read_index_html():
+    """Read the built frontend entry page, or None if the frontend isn't built"""
+    try:
+        return (FRONTEND_DIST / 'index.html').read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+# index.html is read once; set FRONTEND_DEV=1 to pick up rebuilds without a restart
+FRONTEND_DEV = os.environ.get('FRONTEND_DEV') == '1'
+_INDEX_HTML = _read_index_html()
 
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve_frontend(path):
     """Serve React frontend"""
-    from flask import send_from_directory
-    
     # Skip API routes - they're handled by other handlers
     if path.startswith('api/'):
         return jsonify({'error': 'API endpoint not found'}), 404
@@ -103,9 +376,9 @@ def serve_frontend(path):
             return send_from_directory(FRONTEND_DIST, path)
     
     # Otherwise serve index.html (for React Router)
-    index_path = FRONTEND_DIST / 'index.html'
-    if index_path.exists():
-        return send_from_directory(FRONTEND_DIST, 'index.html')
+    index_html = _read_index_html() if FRONTEND_DEV else _INDEX_HTML
+    if index_html is not None:
+        return Response(index_html, mimetype='text/html')
     else:
         # Fallback if dist not built
         return jsonify({
@@ -130,274 +403,258 @@ def health_check():
 
 
 @app.route('/api/predict', methods=['POST'])
+@safe_endpoint
 def predict():
     """Predict house price"""
-    try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No input data provided'}), 400
-        
-        # Prepare input features
-        input_df = pd.DataFrame([data])
-        
-        # Add crime data if city provided
-        city = data.get('city', 'Default')
-        crime_info = get_city_crime_score(city)
-        
-        # Feature engineering on input
-        if 'area' in input_df.columns:
-            if 'bedrooms' in input_df.columns:
-                input_df['bedroom_ratio'] = input_df['bedrooms'] / input_df['area'] * 1000
-            if 'bathrooms' in input_df.columns and 'bedrooms' in input_df.columns:
-                input_df['bathroom_ratio'] = input_df['bathrooms'] / input_df['bedrooms'].replace(0, 1)
-            if 'bedrooms' in input_df.columns and 'bathrooms' in input_df.columns:
-                input_df['total_rooms'] = input_df['bedrooms'] + input_df['bathrooms']
-        
-        # Binary encodings
-        binary_cols = ['mainroad', 'guestroom', 'basement', 'hotwaterheating', 
-                       'airconditioning', 'prefarea']
-        for col in binary_cols:
-            if col in input_df.columns:
-                if input_df[col].dtype == object:
-                    input_df[col] = input_df[col].map({'yes': 1, 'no': 0}).fillna(0).astype(int)
-        
-        # Furnishing
-        if 'furnishingstatus' in input_df.columns:
-            furnishing_map = {'unfurnished': 0, 'semi-furnished': 1, 'furnished': 2}
-            input_df['furnishing_score'] = input_df['furnishingstatus'].map(furnishing_map).fillna(1)
-        
-        # Amenity score
-        amenity_cols = [c for c in binary_cols if c in input_df.columns]
-        if amenity_cols:
-            input_df['amenity_score'] = input_df[amenity_cols].sum(axis=1)
-        
-        # Ensure all required features exist
-        for feat in model.feature_names:
-            if feat not in input_df.columns:
-                input_df[feat] = 0
-        
-        # Select only model features
-        input_features = input_df[model.feature_names]
-        
-        # Make prediction
-        prediction = model.predict(input_features)
-        
-        # Format price (Indian format: Lakhs/Crores)
-        price = prediction['predicted_price']
-        if price >= 10000000:  # 1 Crore
-            price_formatted = f"₹{price/10000000:.2f} Cr"
-        else:
-            price_formatted = f"₹{price/100000:.2f} L"
-        
-        # Price range formatting
-        lower = prediction['price_lower']
-        upper = prediction['price_upper']
-        if upper >= 10000000:
-            range_formatted = f"₹{lower/10000000:.2f} Cr - ₹{upper/10000000:.2f} Cr"
-        else:
-            range_formatted = f"₹{lower/100000:.2f} L - ₹{upper/100000:.2f} L"
-        
-        # Calculate price per sqft
-        price_per_sqft = price / data.get('area', 1)
-        
-        response = {
-            'success': True,
-            'prediction': {
-                'price': float(price),
-                'price_formatted': price_formatted,
-                'price_range': {
-                    'lower': float(lower),
-                    'upper': float(upper),
-                    'formatted': range_formatted
-                },
-                'price_per_sqft': float(price_per_sqft),
-                'confidence': float(prediction['confidence']) * 100
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No input data provided'}), 400
+    
+    return jsonify({**_predict_core(data), 'location': _location(data)})
+
+
+@memoize_response
+def _predict_core(data: dict) -> dict:
+    """Build the model-derived prediction response for a single property"""
+    return _prediction_response(data, model.predict(_prepare_features(data)))
+
+
+def _location(data: dict) -> dict:
+    """Crime data for the property's city, looked up per request"""
+    # Not part of the memoized responses: real-time lookups carry their own TTLs
+    city = data.get('city', 'Default')
+    crime_info = get_city_crime_score(city)
+    return {
+        'city': city,
+        'crime_index': crime_info['crime_index'],
+        'safety_score': crime_info['safety_score']
+    }
+
+
+def _locations(items: list) -> list:
+    """Crime data for many properties at once, same values as _location per item"""
+    cities = pd.Series([item.get('city', 'Default') for item in items], dtype=object)
+    crime_index, safety_score = get_city_crime_scores_batch(cities)
+    return [
+        {'city': city, 'crime_index': index, 'safety_score': safety}
+        for city, index, safety in zip(cities, crime_index.tolist(), safety_score.tolist())
+    ]
+
+
+def _prediction_response(data: dict, prediction: dict) -> dict:
+    """Format a model prediction for one property (without location) as an API response"""
+    # Format price (Indian format: Lakhs/Crores)
+    price = prediction['predicted_price']
+    if price >= 10000000:  # 1 Crore
+        price_formatted = f"₹{price/10000000:.2f} Cr"
+    else:
+        price_formatted = f"₹{price/100000:.2f} L"
+    
+    # Price range formatting
+    lower = prediction['price_lower']
+    upper = prediction['price_upper']
+    if upper >= 10000000:
+        range_formatted = f"₹{lower/10000000:.2f} Cr - ₹{upper/10000000:.2f} Cr"
+    else:
+        range_formatted = f"₹{lower/100000:.2f} L - ₹{upper/100000:.2f} L"
+    
+    # Calculate price per sqft
+    price_per_sqft = price / data.get('area', 1)
+    
+    response = {
+        'success': True,
+        'prediction': {
+            'price': price,
+            'price_formatted': price_formatted,
+            'price_range': {
+                'lower': lower,
+                'upper': upper,
+                'formatted': range_formatted
             },
-            'location': {
-                'city': city,
-                'crime_index': crime_info['crime_index'],
-                'safety_score': crime_info['safety_score']
-            }
+            'price_per_sqft': price_per_sqft,
+            'confidence': prediction['confidence'] * 100
         }
-        
-        return jsonify(response)
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    }
+    
+    return response
+
+
+@app.route('/api/predict_batch', methods=['POST'])
+@safe_endpoint
+def predict_batch():
+    """Predict prices for a list of properties with a single model call"""
+    items = request.get_json()
+    
+    if not items or not isinstance(items, list):
+        return jsonify({'error': 'Expected a non-empty list of properties'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} properties per batch'}), 400
+    for i, item in enumerate(items):
+        # Same check as /api/predict, per item
+        if not item or not isinstance(item, dict):
+            return jsonify({'error': f'Property at index {i} must be a non-empty object'}), 400
+    
+    # Serve what we can from the single-predict cache
+    keys = [cache_key(item) for item in items]
+    results = [_predict_core.cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    
+    if missing:
+        X = np.zeros((len(missing), len(FEATURE_IDX)), dtype=np.float32)
+        for row, i in zip(X, missing):
+            fill_feature_row(items[i], row)
+        
+        predictions = model.predict_batch(X)
+        for i, prediction in zip(missing, predictions):
+            results[i] = _prediction_response(items[i], prediction)
+            _predict_core.cache.put(keys[i], results[i])
+    
+    return jsonify({
+        'success': True,
+        'predictions': [
+            {**result, 'location': location} for result, location in zip(results, _locations(items))
+        ]
+    })
 
 
 @app.route('/api/explain', methods=['POST'])
+@safe_endpoint
 def explain():
     """Get explanation for prediction"""
-    try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No input data provided'}), 400
-        
-        # Prepare input (same as predict)
-        input_df = pd.DataFrame([data])
-        
-        # Feature engineering
-        if 'area' in input_df.columns and 'bedrooms' in input_df.columns:
-            input_df['bedroom_ratio'] = input_df['bedrooms'] / input_df['area'] * 1000
-        if 'bathrooms' in input_df.columns and 'bedrooms' in input_df.columns:
-            input_df['bathroom_ratio'] = input_df['bathrooms'] / input_df['bedrooms'].replace(0, 1)
-        if 'bedrooms' in input_df.columns and 'bathrooms' in input_df.columns:
-            input_df['total_rooms'] = input_df['bedrooms'] + input_df['bathrooms']
-        
-        # Binary columns
-        binary_cols = ['mainroad', 'guestroom', 'basement', 'hotwaterheating', 
-                       'airconditioning', 'prefarea']
-        for col in binary_cols:
-            if col in input_df.columns:
-                if input_df[col].dtype == object:
-                    input_df[col] = input_df[col].map({'yes': 1, 'no': 0}).fillna(0).astype(int)
-        
-        if 'furnishingstatus' in input_df.columns:
-            furnishing_map = {'unfurnished': 0, 'semi-furnished': 1, 'furnished': 2}
-            input_df['furnishing_score'] = input_df['furnishingstatus'].map(furnishing_map).fillna(1)
-        
-        amenity_cols = [c for c in binary_cols if c in input_df.columns]
-        if amenity_cols:
-            input_df['amenity_score'] = input_df[amenity_cols].sum(axis=1)
-        
-        for feat in model.feature_names:
-            if feat not in input_df.columns:
-                input_df[feat] = 0
-        
-        input_features = input_df[model.feature_names]
-        
-        # Get explanation
-        explanation = explainer.explain_prediction(input_features)
-        
-        return jsonify({
-            'success': True,
-            'explanation': explanation
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No input data provided'}), 400
+    
+    return jsonify(_explain_core(data))
+
+
+@memoize_response
+def _explain_core(data: dict) -> dict:
+    """Build the SHAP explanation response for a single property"""
+    input_features = _feature_frame(_prepare_features(data))
+    
+    # Get explanation
+    explanation = explainer.explain_prediction(input_features)
+    
+    return {
+        'success': True,
+        'explanation': explanation
+    }
+
+
+@app.route('/api/predict_explain', methods=['POST'])
+@safe_endpoint
+def predict_explain():
+    """Predict house price and explain it from a single feature build"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No input data provided'}), 400
+    
+    return jsonify({**_predict_explain_core(data), 'location': _location(data)})
+
+
+@memoize_response
+def _predict_explain_core(data: dict) -> dict:
+    """Build the combined prediction + explanation response (without location) for a single property"""
+    row = _prepare_features(data)
+    
+    response = _prediction_response(data, model.predict(row))
+    response['explanation'] = explainer.explain_prediction(_feature_frame(row))
+    return response
 
 
 @app.route('/api/compare', methods=['POST'])
+@safe_endpoint
 def compare():
     """Get similar properties and market comparison"""
-    try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No input data provided'}), 400
-        
-        # Prepare input
-        input_df = pd.DataFrame([data])
-        
-        # Feature engineering (simplified)
-        for feat in model.feature_names:
-            if feat not in input_df.columns:
-                input_df[feat] = X_train[feat].median() if feat in X_train.columns else 0
-        
-        input_features = input_df[model.feature_names]
-        
-        # Get prediction first
-        prediction = model.predict(input_features)
-        
-        # Get similar properties
-        similar = get_similar_properties(X_train, y_train, input_features, n_similar=5)
-        
-        # Market comparison
-        similar_prices = [s['price'] for s in similar]
-        market_comparison = compare_to_market(prediction['predicted_price'], similar_prices)
-        
-        return jsonify({
-            'success': True,
-            'similar_properties': similar,
-            'market_comparison': market_comparison
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No input data provided'}), 400
+    
+    return jsonify(_compare_core(data))
+
+
+@memoize_response
+def _compare_core(data: dict) -> dict:
+    """Build the similar-properties response for a single property"""
+    # Missing features fall back to the training medians
+    input_features = _feature_frame(_prepare_features(data, TRAIN_MEDIANS))
+    
+    # Get prediction first
+    prediction = model.predict(input_features)
+    
+    # Get similar properties
+    similar = get_similar_properties(similarity_index, input_features, n_similar=5)
+    
+    # Market comparison
+    similar_prices = [s['price'] for s in similar]
+    market_comparison = compare_to_market(prediction['predicted_price'], similar_prices)
+    
+    return {
+        'success': True,
+        'similar_properties': similar,
+        'market_comparison': market_comparison
+    }
+
+
+# CITY_CRIME_INDEX is static, so the city list is serialized once at import
+_CITIES_JSON = orjson.dumps({
+    'cities': sorted(
+        [
+            {'name': city, 'crime_index': score, 'safety_score': 10 - score}
+            for city, score in CITY_CRIME_INDEX.items()
+            if city != 'Default'
+        ],
+        key=lambda x: x['name']
+    )
+})
 
 
 @app.route('/api/cities', methods=['GET'])
 def get_cities():
     """Get list of available cities with crime data"""
-    cities = [
-        {'name': city, 'crime_index': score, 'safety_score': 10 - score}
-        for city, score in CITY_CRIME_INDEX.items()
-        if city != 'Default'
-    ]
-    cities.sort(key=lambda x: x['name'])
-    return jsonify({'cities': cities})
+    return Response(_CITIES_JSON, mimetype='application/json')
 
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get dataset statistics"""
-    if X_train is None:
+    if stats_cache is None:
         return jsonify({'error': 'Data not loaded'}), 500
     
-    stats = {
-        'total_properties': len(y_train),
-        'price_range': {
-            'min': float(y_train.min()),
-            'max': float(y_train.max()),
-            'mean': float(y_train.mean()),
-            'median': float(y_train.median())
-        },
-        'features': {
-            feat: {
-                'min': float(X_train[feat].min()),
-                'max': float(X_train[feat].max()),
-                'mean': float(X_train[feat].mean())
-            }
-            for feat in ['area', 'bedrooms', 'bathrooms'] 
-            if feat in X_train.columns
-        },
-        'model_metrics': model.metrics.get('individual_models', {}).get('ensemble', {})
-    }
-    
-    return jsonify(stats)
+    return jsonify(stats_cache)
 
 
 @app.route('/api/feature-importance', methods=['GET'])
 def get_feature_importance():
     """Get feature importance from model"""
-    importance = model.get_feature_importance()
-    
-    # Get average importance sorted
-    avg_importance = importance.get('average', {})
-    sorted_importance = dict(sorted(
-        avg_importance.items(),
-        key=lambda x: x[1],
-        reverse=True
-    ))
+    if feature_importance_json is None:
+        return jsonify({'error': 'Model not loaded'}), 500
     
-    return jsonify({
-        'feature_importance': sorted_importance,
-        'model_specific': importance
-    })
+    return Response(feature_importance_json, mimetype='application/json')
 
 
 # ==================== AI-POWERED ENDPOINTS ====================
 
 @app.route('/api/ai/market-data', methods=['GET'])
+@safe_endpoint
 def get_ai_market_data():
     """Get real-time market data using Perplexity AI"""
     city = request.args.get('city', 'Mumbai')
     
-    try:
-        market_data = perplexity_ai.get_real_time_market_data(city)
-        return jsonify({
-            'success': True,
-            'data': market_data
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    market_data = perplexity_ai.get_real_time_market_data(city)
+    return jsonify({
+        'success': True,
+        'data': market_data
+    })
 
 
 @app.route('/api/ai/listings', methods=['POST'])
+@safe_endpoint
 def get_ai_listings():
     """Get live property listings using AI"""
     data = request.get_json()
@@ -405,17 +662,23 @@ def get_ai_listings():
     bedrooms = data.get('bedrooms', 2)
     budget = data.get('budget_lakhs', 50)
     
-    try:
-        listings = perplexity_ai.get_live_property_listings(city, bedrooms, budget)
-        return jsonify({
-            'success': True,
-            'listings': listings
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    listings = perplexity_ai.get_live_property_listings(city, bedrooms, budget)
+    return jsonify({
+        'success': True,
+        'listings': listings
+    })
+
+
+def _collect_amenities(data: dict) -> list:
+    """Names of the amenities flagged in a request ('yes' or true)"""
+    return [
+        key for key in ['mainroad', 'airconditioning', 'basement', 'guestroom', 'prefarea']
+        if BINARY_MAP.get(data.get(key), 0)
+    ]
 
 
 @app.route('/api/ai/enhance-prediction', methods=['POST'])
+@safe_endpoint
 def enhance_prediction_ai():
     """Enhance ML prediction with AI insights"""
     data = request.get_json()
@@ -423,40 +686,50 @@ def enhance_prediction_ai():
     city = data.get('city', 'Mumbai')
     area = data.get('area', 1000)
     bedrooms = data.get('bedrooms', 2)
+    amenities = _collect_amenities(data)
     
-    # Collect amenities
-    amenities = []
-    for key in ['mainroad', 'airconditioning', 'basement', 'guestroom', 'prefarea']:
-        if data.get(key):
-            amenities.append(key)
-    
-    try:
-        enhanced = perplexity_ai.enhance_prediction(
-            base_price, city, area, bedrooms, amenities
-        )
-        return jsonify({
-            'success': True,
-            'enhanced_prediction': enhanced
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    enhanced = perplexity_ai.enhance_prediction(
+        base_price, city, area, bedrooms, amenities
+    )
+    return jsonify({
+        'success': True,
+        'enhanced_prediction': enhanced
+    })
 
 
 @app.route('/api/ai/market-comparison', methods=['POST'])
+@safe_endpoint
 def get_ai_market_comparison():
     """Get AI-powered real-time market comparison"""
     data = request.get_json()
     city = data.get('city', 'Mumbai')
     predicted_price = data.get('predicted_price', 5000000)
     
-    try:
-        comparison = perplexity_ai.get_market_comparison(city, predicted_price)
-        return jsonify({
-            'success': True,
-            'comparison': comparison
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    comparison = perplexity_ai.get_market_comparison(city, predicted_price)
+    return jsonify({
+        'success': True,
+        'comparison': comparison
+    })
+
+
+@app.route('/api/ai/bundle', methods=['POST'])
+@safe_endpoint
+def get_ai_bundle():
+    """Market data, platform comparison and enhanced prediction in one round-trip"""
+    data = request.get_json()
+    base_price = data.get('base_price', 5000000)
+    city = data.get('city', 'Mumbai')
+    area = data.get('area', 1000)
+    bedrooms = data.get('bedrooms', 2)
+    amenities = _collect_amenities(data)
+    
+    bundle = perplexity_ai.get_insights_bundle(
+        city, base_price, area, bedrooms, amenities
+    )
+    return jsonify({
+        'success': True,
+        **bundle
+    })
 
 
 if __name__ == '__main__':
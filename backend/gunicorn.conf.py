@@ -0,0 +1,19 @@
+"""
+Gunicorn configuration for the House Price Prediction API
+Loads the model once in the master process before workers are forked
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+threads = 2
+timeout = 120
+
+# Import the app in the master so the loaded model is shared copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    """Load the model pre-fork (app.py only loads it itself when run directly)"""
+    from app import load_model
+    load_model()
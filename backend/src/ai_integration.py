@@ -5,9 +5,18 @@ Real-time market data, enhanced predictions, and live property listings
 
 import os
 import json
+import time
+import hashlib
+import sqlite3
+import threading
 import requests
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, List, Optional
 from pathlib import Path
+from cachetools import TLRUCache, TTLCache
 
 # Load environment variables
 try:
@@ -19,6 +28,204 @@ except ImportError:
 PERPLEXITY_API_KEY = os.getenv('PERPLEXITY_API_KEY', '')
 PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions"
 
+# Market/crime answers change on the order of hours, so responses are reused for a while
+QUERY_CACHE_TTL = int(os.getenv('PERPLEXITY_CACHE_TTL', 3600))
+QUERY_CACHE_PATH = Path(os.getenv(
+    'PERPLEXITY_CACHE_PATH',
+    Path(__file__).parent.parent / 'cache' / 'perplexity_cache.sqlite3'
+))
+
+
+class QueryCache:
+    """Two-tier (in-memory + SQLite) TTL cache for AI query responses"""
+    
+    def __init__(self, path: Path, ttl: int = QUERY_CACHE_TTL, maxsize: int = 2048):
+        self.path = Path(path)
+        self.ttl = ttl
+        # Entries are (expires_at, value) so rows promoted from disk keep their remaining lifetime
+        self._memory = TLRUCache(maxsize=maxsize, ttu=lambda _key, entry, _now: entry[0],
+                                 timer=time.time)
+        self._lock = threading.Lock()
+        self._disk_ready = False
+    
+    def _connect(self) -> sqlite3.Connection:
+        # A short-lived connection per call keeps this safe across threads and forked workers;
+        # callers close it (the connection's own context manager only commits)
+        if not self._disk_ready:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=5)
+        if not self._disk_ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, ts INTEGER, value TEXT)"
+            )
+            self._disk_ready = True
+        return conn
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached value younger than the TTL, or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is not None:
+            return entry[1]
+        
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute(
+                    "SELECT ts, value FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Query cache read failed: {e}")
+            return None
+        
+        if row is None:
+            return None
+        expires_at = row[0] + self.ttl
+        if expires_at <= time.time():
+            return None
+        with self._lock:
+            self._memory[key] = (expires_at, row[1])
+        return row[1]
+    
+    def set(self, key: str, value: str):
+        """Store a value in memory and on disk, pruning expired disk rows"""
+        now = int(time.time())
+        with self._lock:
+            self._memory[key] = (now + self.ttl, value)
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("DELETE FROM cache WHERE ts <= ?", (now - self.ttl,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, ts, value) VALUES (?, ?, ?)",
+                    (key, now, value)
+                )
+        except sqlite3.Error as e:
+            print(f"Query cache write failed: {e}")
+
+
+_query_cache = QueryCache(QUERY_CACHE_PATH)
+
+_json_decoder = json.JSONDecoder()
+
+
+def _extract_json(text: Optional[str], container: str = '{'):
+    """Return the first complete JSON object ('{') or array ('[') embedded in text"""
+    if not text:
+        return None
+    
+    # raw_decode matches brackets properly, so trailing braces in prose are ignored
+    start = text.find(container)
+    while start >= 0:
+        try:
+            value, _ = _json_decoder.raw_decode(text, start)
+            return value
+        except json.JSONDecodeError:
+            start = text.find(container, start + 1)
+    return None
+
+
+# Shared pool for overlapping independent API calls (threads start lazily, after fork)
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='perplexity')
+
+
+# Prompt templates, formatted per call with str.format (kept free of indentation
+# so no padding whitespace is sent to the API)
+MARKET_DATA_SYSTEM_PROMPT = (
+    "You are a real estate market analyst. Provide accurate, up-to-date "
+    "property market data in JSON format only. No explanations, just JSON."
+)
+MARKET_DATA_PROMPT = """Get the current real estate market data for {city}, India.
+Return ONLY valid JSON with this structure:
+{{
+"city": "{city}",
+"avg_price_per_sqft": <number>,
+"market_trend": "rising/stable/declining",
+"yoy_change_percent": <number>,
+"demand_level": "high/medium/low",
+"best_areas": ["area1", "area2", "area3"],
+"price_range_lakhs": {{"min": <num>, "max": <num>}},
+"rental_yield_percent": <number>,
+"data_source": "real-time market analysis"
+}}"""
+
+LISTINGS_SYSTEM_PROMPT = (
+    "You are a real estate listing aggregator. Provide property listings "
+    "in JSON array format only. No explanations, just JSON array."
+)
+LISTINGS_PROMPT = """Find current property listings in {city}, India with approximately {bedrooms} bedrooms and budget around ₹{budget_lakhs} lakhs.
+Return ONLY a valid JSON array with 3-5 listings:
+[
+{{
+"platform": "platform_name",
+"price_lakhs": <number>,
+"area_sqft": <number>,
+"bedrooms": <number>,
+"location": "specific area",
+"price_per_sqft": <number>,
+"listing_age_days": <number>
+}}
+]"""
+
+VALUATION_SYSTEM_PROMPT = (
+    "You are a real estate valuation expert. Analyze property values "
+    "and provide assessment in JSON format only."
+)
+VALUATION_PROMPT = """Analyze this property valuation:
+- City: {city}, India
+- Predicted Price: ₹{price_lakhs:.2f} Lakhs
+- Area: {area_sqft} sq ft
+- Bedrooms: {bedrooms}
+- Amenities: {amenities}
+
+Return ONLY valid JSON:
+{{
+"ai_adjusted_price_lakhs": <number>,
+"confidence_score": <0-100>,
+"market_alignment": "undervalued/fair/overvalued",
+"price_adjustment_percent": <number can be negative>,
+"key_factors": ["factor1", "factor2", "factor3"],
+"investment_rating": "excellent/good/average/poor",
+"recommendation": "short recommendation text"
+}}"""
+
+COMPARISON_SYSTEM_PROMPT = (
+    "You are a property price comparison expert. Provide platform-wise "
+    "pricing in JSON format only."
+)
+COMPARISON_PROMPT = """Compare property prices in {city}, India across major platforms.
+For a property valued around ₹{price_lakhs:.2f} Lakhs.
+
+Return ONLY valid JSON:
+{{
+"platforms": [
+{{"name": "99acres", "avg_price_lakhs": <num>, "listings_count": <num>}},
+{{"name": "MagicBricks", "avg_price_lakhs": <num>, "listings_count": <num>}},
+{{"name": "Housing.com", "avg_price_lakhs": <num>, "listings_count": <num>}},
+{{"name": "NoBroker", "avg_price_lakhs": <num>, "listings_count": <num>}},
+{{"name": "CommonFloor", "avg_price_lakhs": <num>, "listings_count": <num>}}
+],
+"market_average_lakhs": <num>,
+"your_price_vs_market": "below/at/above",
+"best_platform_to_buy": "platform_name",
+"market_insight": "brief insight"
+}}"""
+
+CRIME_SYSTEM_PROMPT = (
+    "You are a crime statistics analyst. Provide accurate crime data "
+    "in JSON format only. No explanations, just JSON."
+)
+CRIME_PROMPT = """Get the current crime statistics for {city}, India.
+Return ONLY valid JSON with this structure:
+{{
+"city": "{city}",
+"crime_index": <number from 1-10, where 10 is highest crime>,
+"safety_score": <number from 1-10, where 10 is safest>,
+"crime_rate_per_lakh": <number>,
+"common_crimes": ["crime1", "crime2", "crime3"],
+"safety_rank_india": <number out of 100 cities>,
+"year_trend": "increasing/stable/decreasing",
+"data_source": "NCRB/Police records"
+}}"""
+
 
 class PerplexityAI:
     """AI-powered real-time market intelligence"""
@@ -30,12 +237,42 @@ class PerplexityAI:
             "Content-Type": "application/json"
         }
         self.model = "llama-3.1-sonar-small-128k-online"  # Real-time online model
+        
+        # Persistent session so TCP/TLS connections are reused across queries
+        self._session = requests.Session()
+        self._session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=2,
+                read=0,  # never resend a POST that timed out waiting for the answer
+                backoff_factor=0.3,
+                status_forcelist=(429, 502, 503, 504),
+                allowed_methods=frozenset({'POST'})
+            )
+        )
+        self._session.mount('https://', adapter)
+    
+    def _cache_key(self, prompt: str, system_prompt: str = None) -> str:
+        """Hash of everything that determines the model's answer"""
+        raw = b'\0'.join([
+            self.model.encode(), (system_prompt or '').encode(), prompt.encode()
+        ])
+        return hashlib.blake2b(raw).hexdigest()
     
-    def _query(self, prompt: str, system_prompt: str = None) -> Optional[str]:
-        """Make a query to Perplexity AI"""
+    def _query(self, prompt: str, system_prompt: str = None,
+               force_refresh: bool = False) -> Optional[str]:
+        """Make a query to Perplexity AI (cached unless force_refresh)"""
         if not self.api_key:
             return None
         
+        cache_key = self._cache_key(prompt, system_prompt)
+        if not force_refresh:
+            cached = _query_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
@@ -49,15 +286,16 @@ class PerplexityAI:
         }
         
         try:
-            response = requests.post(
+            response = self._session.post(
                 PERPLEXITY_API_URL,
-                headers=self.headers,
                 json=payload,
                 timeout=30
             )
             if response.status_code == 200:
                 data = response.json()
-                return data['choices'][0]['message']['content']
+                content = data['choices'][0]['message']['content']
+                _query_cache.set(cache_key, content)
+                return content
             else:
                 print(f"Perplexity API error: {response.status_code}")
                 return None
@@ -67,68 +305,26 @@ class PerplexityAI:
     
     def get_real_time_market_data(self, city: str) -> Dict:
         """Get real-time property market data for a city"""
-        system_prompt = """You are a real estate market analyst. Provide accurate, up-to-date 
-        property market data in JSON format only. No explanations, just JSON."""
-        
-        prompt = f"""Get the current real estate market data for {city}, India.
-        Return ONLY valid JSON with this structure:
-        {{
-            "city": "{city}",
-            "avg_price_per_sqft": <number>,
-            "market_trend": "rising/stable/declining",
-            "yoy_change_percent": <number>,
-            "demand_level": "high/medium/low",
-            "best_areas": ["area1", "area2", "area3"],
-            "price_range_lakhs": {{"min": <num>, "max": <num>}},
-            "rental_yield_percent": <number>,
-            "data_source": "real-time market analysis"
-        }}"""
+        prompt = MARKET_DATA_PROMPT.format(city=city)
         
-        response = self._query(prompt, system_prompt)
+        response = self._query(prompt, MARKET_DATA_SYSTEM_PROMPT)
         
-        if response:
-            try:
-                # Extract JSON from response
-                start = response.find('{')
-                end = response.rfind('}') + 1
-                if start >= 0 and end > start:
-                    return json.loads(response[start:end])
-            except json.JSONDecodeError:
-                pass
+        data = _extract_json(response)
+        if data is not None:
+            return data
         
         # Fallback data if API fails
         return self._get_fallback_market_data(city)
     
     def get_live_property_listings(self, city: str, bedrooms: int, budget_lakhs: float) -> List[Dict]:
         """Get live property listings matching criteria"""
-        system_prompt = """You are a real estate listing aggregator. Provide property listings 
-        in JSON array format only. No explanations, just JSON array."""
-        
-        prompt = f"""Find current property listings in {city}, India with approximately {bedrooms} bedrooms 
-        and budget around ₹{budget_lakhs} lakhs.
-        Return ONLY a valid JSON array with 3-5 listings:
-        [
-            {{
-                "platform": "platform_name",
-                "price_lakhs": <number>,
-                "area_sqft": <number>,
-                "bedrooms": <number>,
-                "location": "specific area",
-                "price_per_sqft": <number>,
-                "listing_age_days": <number>
-            }}
-        ]"""
+        prompt = LISTINGS_PROMPT.format(city=city, bedrooms=bedrooms, budget_lakhs=budget_lakhs)
         
-        response = self._query(prompt, system_prompt)
+        response = self._query(prompt, LISTINGS_SYSTEM_PROMPT)
         
-        if response:
-            try:
-                start = response.find('[')
-                end = response.rfind(']') + 1
-                if start >= 0 and end > start:
-                    return json.loads(response[start:end])
-            except json.JSONDecodeError:
-                pass
+        listings = _extract_json(response, container='[')
+        if listings is not None:
+            return listings
         
         # Fallback listings
         return self._get_fallback_listings(city, bedrooms, budget_lakhs)
@@ -136,41 +332,19 @@ class PerplexityAI:
     def enhance_prediction(self, base_price: float, city: str, area_sqft: int, 
                           bedrooms: int, amenities: List[str]) -> Dict:
         """Use AI to enhance and validate the ML prediction"""
-        system_prompt = """You are a real estate valuation expert. Analyze property values 
-        and provide assessment in JSON format only."""
-        
         amenities_str = ", ".join(amenities) if amenities else "basic"
         
-        prompt = f"""Analyze this property valuation:
-        - City: {city}, India
-        - Predicted Price: ₹{base_price/100000:.2f} Lakhs
-        - Area: {area_sqft} sq ft
-        - Bedrooms: {bedrooms}
-        - Amenities: {amenities_str}
-        
-        Return ONLY valid JSON:
-        {{
-            "ai_adjusted_price_lakhs": <number>,
-            "confidence_score": <0-100>,
-            "market_alignment": "undervalued/fair/overvalued",
-            "price_adjustment_percent": <number can be negative>,
-            "key_factors": ["factor1", "factor2", "factor3"],
-            "investment_rating": "excellent/good/average/poor",
-            "recommendation": "short recommendation text"
-        }}"""
+        prompt = VALUATION_PROMPT.format(
+            city=city, price_lakhs=base_price / 100000, area_sqft=area_sqft,
+            bedrooms=bedrooms, amenities=amenities_str
+        )
         
-        response = self._query(prompt, system_prompt)
+        response = self._query(prompt, VALUATION_SYSTEM_PROMPT)
         
-        if response:
-            try:
-                start = response.find('{')
-                end = response.rfind('}') + 1
-                if start >= 0 and end > start:
-                    data = json.loads(response[start:end])
-                    data['ai_enhanced'] = True
-                    return data
-            except json.JSONDecodeError:
-                pass
+        data = _extract_json(response)
+        if data is not None:
+            data['ai_enhanced'] = True
+            return data
         
         # Fallback if API fails
         return {
@@ -186,43 +360,33 @@ class PerplexityAI:
     
     def get_market_comparison(self, city: str, predicted_price: float) -> Dict:
         """Get real-time market comparison from multiple platforms"""
-        system_prompt = """You are a property price comparison expert. Provide platform-wise 
-        pricing in JSON format only."""
+        prompt = COMPARISON_PROMPT.format(city=city, price_lakhs=predicted_price / 100000)
         
-        prompt = f"""Compare property prices in {city}, India across major platforms.
-        For a property valued around ₹{predicted_price/100000:.2f} Lakhs.
-        
-        Return ONLY valid JSON:
-        {{
-            "platforms": [
-                {{"name": "99acres", "avg_price_lakhs": <num>, "listings_count": <num>}},
-                {{"name": "MagicBricks", "avg_price_lakhs": <num>, "listings_count": <num>}},
-                {{"name": "Housing.com", "avg_price_lakhs": <num>, "listings_count": <num>}},
-                {{"name": "NoBroker", "avg_price_lakhs": <num>, "listings_count": <num>}},
-                {{"name": "CommonFloor", "avg_price_lakhs": <num>, "listings_count": <num>}}
-            ],
-            "market_average_lakhs": <num>,
-            "your_price_vs_market": "below/at/above",
-            "best_platform_to_buy": "platform_name",
-            "market_insight": "brief insight"
-        }}"""
+        response = self._query(prompt, COMPARISON_SYSTEM_PROMPT)
         
-        response = self._query(prompt, system_prompt)
-        
-        if response:
-            try:
-                start = response.find('{')
-                end = response.rfind('}') + 1
-                if start >= 0 and end > start:
-                    data = json.loads(response[start:end])
-                    data['real_time'] = True
-                    return data
-            except json.JSONDecodeError:
-                pass
+        data = _extract_json(response)
+        if data is not None:
+            data['real_time'] = True
+            return data
         
         # Fallback comparison
         return self._get_fallback_comparison(city, predicted_price)
     
+    def get_insights_bundle(self, city: str, base_price: float, area_sqft: int,
+                            bedrooms: int, amenities: List[str]) -> Dict:
+        """Fetch market data, platform comparison and enhanced prediction concurrently"""
+        market_data = _executor.submit(self.get_real_time_market_data, city)
+        comparison = _executor.submit(self.get_market_comparison, city, base_price)
+        enhanced = _executor.submit(
+            self.enhance_prediction, base_price, city, area_sqft, bedrooms, amenities
+        )
+        
+        return {
+            'market_data': market_data.result(),
+            'comparison': comparison.result(),
+            'enhanced_prediction': enhanced.result()
+        }
+    
     def _get_fallback_market_data(self, city: str) -> Dict:
         """Fallback market data when API unavailable"""
         city_data = {
@@ -301,40 +465,33 @@ class PerplexityAI:
     
     def get_city_crime_data(self, city: str) -> Optional[Dict]:
         """Get real-time crime data for any city using Perplexity AI"""
-        system_prompt = """You are a crime statistics analyst. Provide accurate crime data 
-        in JSON format only. No explanations, just JSON."""
-        
-        prompt = f"""Get the current crime statistics for {city}, India.
-        Return ONLY valid JSON with this structure:
-        {{
-            "city": "{city}",
-            "crime_index": <number from 1-10, where 10 is highest crime>,
-            "safety_score": <number from 1-10, where 10 is safest>,
-            "crime_rate_per_lakh": <number>,
-            "common_crimes": ["crime1", "crime2", "crime3"],
-            "safety_rank_india": <number out of 100 cities>,
-            "year_trend": "increasing/stable/decreasing",
-            "data_source": "NCRB/Police records"
-        }}"""
+        with _city_crime_lock:
+            if city in _city_crime_cache:
+                return _city_crime_cache[city]
+            if city in _city_crime_failures:
+                return None
         
-        response = self._query(prompt, system_prompt)
+        prompt = CRIME_PROMPT.format(city=city)
         
-        if response:
-            try:
-                start = response.find('{')
-                end = response.rfind('}') + 1
-                if start >= 0 and end > start:
-                    data = json.loads(response[start:end])
-                    data['real_time'] = True
-                    return data
-            except json.JSONDecodeError:
-                pass
+        response = self._query(prompt, CRIME_SYSTEM_PROMPT)
         
-        return None
+        data = _extract_json(response)
+        with _city_crime_lock:
+            if data is not None:
+                data['real_time'] = True
+                _city_crime_cache[city] = data
+            else:
+                # Remember failures briefly so unknown cities don't hammer the API
+                _city_crime_failures[city] = True
+        return data
 
 
 # Global instance
 perplexity_ai = PerplexityAI()
 
-# Cache for real-time city crime data (to avoid repeated API calls)
-_city_crime_cache = {}
+# Cache for real-time city crime data (to avoid repeated API calls); answers expire
+# with the same TTL as other Perplexity responses
+CRIME_FAILURE_TTL = 300
+_city_crime_cache = TTLCache(maxsize=1024, ttl=QUERY_CACHE_TTL)
+_city_crime_failures = TTLCache(maxsize=1024, ttl=CRIME_FAILURE_TTL)
+_city_crime_lock = threading.Lock()
@@ -6,8 +6,16 @@ Handles data loading, cleaning, feature engineering, and crime data integration
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import os
 
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'  # multithreaded Arrow CSV reader
+except ImportError:  # pyarrow is optional - fall back to pandas' C parser
+    CSV_ENGINE = 'c'
+
 
 # City crime index based on NCRB data (normalized 1-10 scale, higher = more crime)
 # Extended list of 50+ major Indian cities
@@ -97,10 +105,24 @@ CITY_CRIME_INDEX = {
     'Default': 5.0
 }
 
+# Case-folded view of CITY_CRIME_INDEX for request-time lookups,
+# keeping the canonical city name alongside the index
+_CITY_INDEX_CF = {k.casefold(): (k, v) for k, v in CITY_CRIME_INDEX.items()}
+_DEFAULT = CITY_CRIME_INDEX['Default']
+_INDEX_SERIES = pd.Series({key: index for key, (_, index) in _CITY_INDEX_CF.items()})
+
+# Most distinct unlisted cities one batch may look up in real time; these
+# run concurrently and any further unlisted cities get the default score
+MAX_REALTIME_LOOKUPS_PER_BATCH = 8
+
+# Upper edges of the area categories (sqft); the last category is open-ended
+AREA_BIN_EDGES = np.array([3000, 5000, 7000, 10000])
+AREA_LABELS = ['Small', 'Medium', 'Large', 'Very Large', 'Luxury']
+
 
 def load_housing_data(filepath: str) -> pd.DataFrame:
     """Load housing dataset from CSV"""
-    df = pd.read_csv(filepath)
+    df = pd.read_csv(filepath, engine=CSV_ENGINE)
     return df
 
 
@@ -108,13 +130,12 @@ def load_crime_data(filepath: str) -> pd.DataFrame:
     """Load and aggregate crime data by city (complete dataset)"""
     df = pd.read_csv(filepath)
     
-    # Aggregate crime counts by city
-    city_crime = df.groupby('City').agg({
-        'Report Number': 'count',
-        'Crime Domain': lambda x: (x == 'Violent Crime').sum()
-    }).reset_index()
-    
-    city_crime.columns = ['City', 'total_crimes', 'violent_crimes']
+    # Aggregate crime counts by city (built-in aggregations only, no Python lambda)
+    df['is_violent'] = (df['Crime Domain'] == 'Violent Crime').astype(np.int8)
+    city_crime = df.groupby('City').agg(
+        total_crimes=('Report Number', 'count'),
+        violent_crimes=('is_violent', 'sum')
+    ).reset_index()
     
     # Calculate crime rate (normalized)
     max_crimes = city_crime['total_crimes'].max()
@@ -124,43 +145,39 @@ def load_crime_data(filepath: str) -> pd.DataFrame:
     return city_crime
 
 
+@lru_cache(maxsize=512)
+def _crime_score_cached(city: str) -> tuple:
+    """(city, crime_index, safety_score) for a hardcoded city, or None if unknown"""
+    known = _CITY_INDEX_CF.get(city.casefold() if city else 'default')
+    if known is None:
+        return None
+    name, crime_index = known
+    return name, crime_index, 10 - crime_index
+
+
 def get_city_crime_score(city: str, crime_data: pd.DataFrame = None) -> dict:
     """Get crime score for a city - uses hardcoded data or real-time AI lookup"""
-    city = city.title() if city else 'Default'
-    
-    # First check hardcoded list (fast)
-    if city in CITY_CRIME_INDEX:
-        crime_index = CITY_CRIME_INDEX[city]
-        safety_score = 10 - crime_index
+    # First check hardcoded list (fast, memoized per input string)
+    known = _crime_score_cached(city)
+    if known is not None:
+        name, crime_index, safety_score = known
         return {
-            'city': city,
+            'city': name,
             'crime_index': crime_index,
             'safety_score': safety_score,
             'real_time': False
         }
     
+    city = city.title()
+    
     # If city not found, try real-time lookup via Perplexity AI
     try:
-        from src.ai_integration import perplexity_ai, _city_crime_cache
-        
-        # Check cache first
-        if city in _city_crime_cache:
-            cached = _city_crime_cache[city]
-            return {
-                'city': city,
-                'crime_index': cached.get('crime_index', 5.0),
-                'safety_score': cached.get('safety_score', 5.0),
-                'real_time': True,
-                'cached': True
-            }
+        from src.ai_integration import perplexity_ai
         
-        # Query Perplexity AI for real-time data
+        # Query Perplexity AI for real-time data (cached per city)
         ai_data = perplexity_ai.get_city_crime_data(city)
         
         if ai_data and 'crime_index' in ai_data:
-            # Cache the result
-            _city_crime_cache[city] = ai_data
-            
             crime_index = float(ai_data.get('crime_index', 5.0))
             safety_score = float(ai_data.get('safety_score', 10 - crime_index))
             
@@ -176,7 +193,7 @@ def get_city_crime_score(city: str, crime_data: pd.DataFrame = None) -> dict:
         print(f"Real-time crime lookup failed for {city}: {e}")
     
     # Fallback to default
-    crime_index = CITY_CRIME_INDEX['Default']
+    crime_index = _DEFAULT
     safety_score = 10 - crime_index
     
     return {
@@ -188,24 +205,45 @@ def get_city_crime_score(city: str, crime_data: pd.DataFrame = None) -> dict:
     }
 
 
+def get_city_crime_scores_batch(cities: pd.Series) -> tuple:
+    """Vectorized (crime_index, safety_score) arrays for a Series of cities
+    
+    Hardcoded cities come from one reindex. The first
+    MAX_REALTIME_LOOKUPS_PER_BATCH distinct other cities are looked up
+    concurrently, once each; any beyond that get the default score, so a
+    large batch can't queue an unbounded number of AI calls.
+    """
+    keys = cities.fillna('default').astype(str).str.casefold()
+    crime_index = _INDEX_SERIES.reindex(keys).to_numpy(dtype=float, copy=True)
+    unknown = np.isnan(crime_index)
+    crime_index[unknown] = _DEFAULT
+    safety_score = 10 - crime_index
+    
+    lookup_keys = keys[unknown].unique()[:MAX_REALTIME_LOOKUPS_PER_BATCH]
+    if len(lookup_keys):
+        rows = [(keys == key).to_numpy() for key in lookup_keys]
+        with ThreadPoolExecutor(max_workers=len(rows)) as executor:
+            infos = executor.map(get_city_crime_score, [cities[r].iloc[0] for r in rows])
+            for r, crime_info in zip(rows, infos):
+                crime_index[r] = crime_info['crime_index']
+                safety_score[r] = crime_info['safety_score']
+    
+    return crime_index, safety_score
+
+
 def clean_data(df: pd.DataFrame) -> pd.DataFrame:
     """Clean the housing dataset"""
-    df = df.copy()
-    
     # Handle missing values
     df = df.dropna(subset=['price'])
     
-    # Fill numeric columns with median
+    # Fill numeric columns with median and categorical columns with mode, in one pass
     numeric_cols = df.select_dtypes(include=[np.number]).columns
-    for col in numeric_cols:
-        if df[col].isnull().any():
-            df[col] = df[col].fillna(df[col].median())
-    
-    # Fill categorical columns with mode
-    categorical_cols = df.select_dtypes(include=['object']).columns
-    for col in categorical_cols:
-        if df[col].isnull().any():
-            df[col] = df[col].fillna(df[col].mode()[0])
+    categorical_cols = df.select_dtypes(include=['object', 'string']).columns
+    fill_values = df[numeric_cols].median().to_dict()
+    modes = df[categorical_cols].mode()
+    if not modes.empty:
+        fill_values.update(modes.iloc[0].to_dict())
+    df = df.fillna(fill_values)
     
     # Remove outliers using IQR method for price
     Q1 = df['price'].quantile(0.25)
@@ -213,15 +251,13 @@ def clean_data(df: pd.DataFrame) -> pd.DataFrame:
     IQR = Q3 - Q1
     lower_bound = Q1 - 1.5 * IQR
     upper_bound = Q3 + 1.5 * IQR
-    df = df[(df['price'] >= lower_bound) & (df['price'] <= upper_bound)]
+    df = df[df['price'].between(lower_bound, upper_bound)]
     
     return df
 
 
 def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Create derived features"""
-    df = df.copy()
-    
+    """Create derived features (adds columns to df in place; pass a fresh frame)"""
     # Create derived features
     df['price_per_sqft'] = df['price'] / df['area']
     df['bedroom_ratio'] = df['bedrooms'] / df['area'] * 1000
@@ -231,9 +267,8 @@ def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
     # Binary features
     binary_cols = ['mainroad', 'guestroom', 'basement', 'hotwaterheating', 
                    'airconditioning', 'prefarea']
-    for col in binary_cols:
-        if col in df.columns:
-            df[col] = df[col].map({'yes': 1, 'no': 0}).fillna(0).astype(int)
+    existing_binary_cols = [col for col in binary_cols if col in df.columns]
+    df[existing_binary_cols] = df[existing_binary_cols].eq('yes').astype(np.int8)
     
     # Furnishing status encoding
     if 'furnishingstatus' in df.columns:
@@ -241,29 +276,28 @@ def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
         df['furnishing_score'] = df['furnishingstatus'].map(furnishing_map).fillna(1)
     
     # Amenity score
-    amenity_cols = ['mainroad', 'guestroom', 'basement', 'hotwaterheating', 
-                    'airconditioning', 'prefarea']
-    existing_amenity_cols = [col for col in amenity_cols if col in df.columns]
-    df['amenity_score'] = df[existing_amenity_cols].sum(axis=1)
+    df['amenity_score'] = df[existing_binary_cols].sum(axis=1).astype(np.int8)
     
-    # Area categories
-    df['area_category'] = pd.cut(df['area'], bins=[0, 3000, 5000, 7000, 10000, float('inf')],
-                                  labels=['Small', 'Medium', 'Large', 'Very Large', 'Luxury'])
+    # Area categories as bin codes (right-closed like pd.cut; -1 = no category)
+    area = df['area'].to_numpy(dtype=float)
+    area_codes = np.searchsorted(AREA_BIN_EDGES, area).astype(np.int8)
+    area_codes[~(area > 0)] = -1
+    df['area_category'] = area_codes
     
     return df
 
 
 def encode_features(df: pd.DataFrame, fit: bool = True, encoders: dict = None) -> tuple:
     """Encode categorical features for ML"""
-    df = df.copy()
-    
     if encoders is None:
         encoders = {}
     
-    # One-hot encode area_category
+    # One-hot encode area_category (boolean columns, as pd.get_dummies produced)
     if 'area_category' in df.columns:
-        area_dummies = pd.get_dummies(df['area_category'], prefix='area_cat')
-        df = pd.concat([df, area_dummies], axis=1)
+        area_codes = df['area_category'].to_numpy()
+        df[[f'area_cat_{label}' for label in AREA_LABELS]] = (
+            area_codes[:, None] == np.arange(len(AREA_LABELS))
+        )
     
     # Drop original categorical columns
     cols_to_drop = ['furnishingstatus', 'area_category']
@@ -288,32 +322,39 @@ def prepare_training_data(housing_path: str, crime_path: str = None) -> tuple:
     
     # Separate features and target
     target_col = 'price'
-    feature_cols = [col for col in df.columns if col not in 
-                    [target_col, 'price_per_sqft']]  # Exclude leaky features
     
-    # Keep only numeric columns
-    X = df[feature_cols].select_dtypes(include=[np.number])
+    # Keep only numeric columns, excluding the target and leaky features
+    # (sort=False keeps the frame's column order, which the model relies on)
+    feature_cols = df.select_dtypes(include=[np.number]).columns.difference(
+        [target_col, 'price_per_sqft'], sort=False
+    )
+    X = df[feature_cols]
     y = df[target_col]
     
+    # Downcast for the tree learners: floats to float32, small-range ints to int8
+    downcast = {col: np.float32 for col in X.select_dtypes(include='float').columns}
+    downcast.update({col: np.int8 for col in X.select_dtypes(include='integer').columns
+                     if X[col].between(-128, 127).all()})
+    X = X.astype(downcast)
+    
     # Get feature names
     feature_names = X.columns.tolist()
     
     return X, y, feature_names, encoders
 
 
-def prepare_prediction_input(input_data: dict) -> pd.DataFrame:
-    """Prepare user input for prediction"""
+def prepare_prediction_input(input_data) -> pd.DataFrame:
+    """Prepare user input (a dict, or a list of dicts for several rows) for prediction"""
     # Create DataFrame from input
-    df = pd.DataFrame([input_data])
+    rows = input_data if isinstance(input_data, list) else [input_data]
+    df = pd.DataFrame(rows)
     
     # Apply same feature engineering
     df = engineer_features(df)
     
     # Get crime score if city provided
-    if 'city' in input_data:
-        crime_info = get_city_crime_score(input_data['city'])
-        df['crime_index'] = crime_info['crime_index']
-        df['safety_score'] = crime_info['safety_score']
+    if 'city' in df.columns:
+        df['crime_index'], df['safety_score'] = get_city_crime_scores_batch(df['city'])
     
     return df
 
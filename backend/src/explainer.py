@@ -5,7 +5,7 @@ Provides explanations for model predictions
 
 import pandas as pd
 import numpy as np
-import shap
+import xgboost as xgb
 from typing import Dict, List, Tuple
 
 
@@ -14,51 +14,42 @@ class ModelExplainer:
     
     def __init__(self, model):
         self.model = model
-        self.explainer = None
-        self.background_data = None
+        self.booster = None
         
-    def setup(self, X_train: pd.DataFrame, n_samples: int = 100):
-        """Setup SHAP explainer with background data"""
-        # Use a sample for background
-        if len(X_train) > n_samples:
-            self.background_data = X_train.sample(n=n_samples, random_state=42)
-        else:
-            self.background_data = X_train
-        
-        # Create TreeExplainer for tree-based models
-        # Using XGBoost model from ensemble
+    def setup(self):
+        """Setup the SHAP explainer (TreeSHAP needs no background data)"""
+        # Use XGBoost's native TreeSHAP on the ensemble's XGBoost model
         if hasattr(self.model, 'models') and 'xgboost' in self.model.models:
-            self.explainer = shap.TreeExplainer(self.model.models['xgboost'])
+            self.booster = self.model.models['xgboost'].get_booster()
         
     def explain_prediction(self, X: pd.DataFrame) -> Dict:
         """Explain a single prediction"""
-        if self.explainer is None:
+        if self.booster is None:
             return {'error': 'Explainer not setup'}
         
-        # Get SHAP values
-        shap_values = self.explainer.shap_values(X)
-        
-        # If array, take first sample
-        if isinstance(shap_values, np.ndarray) and shap_values.ndim > 1:
-            shap_values = shap_values[0]
+        # Get SHAP values for the first sample; the last column is the bias (base value)
+        contribs = self.booster.predict(xgb.DMatrix(X), pred_contribs=True)[0]
+        shap_values, base_value = contribs[:-1], contribs[-1]
         
         # Create feature importance dict
         feature_names = X.columns.tolist()
         importance = dict(zip(feature_names, shap_values.tolist()))
         
-        # Sort by absolute importance
-        sorted_importance = dict(sorted(
-            importance.items(), 
-            key=lambda x: abs(x[1]), 
-            reverse=True
-        ))
+        # Pick the 5 largest absolute contributions without sorting every feature
+        abs_values = np.abs(shap_values.astype(np.float64))
+        k = min(5, len(abs_values))
+        top_idx = np.argpartition(abs_values, len(abs_values) - k)[-k:]
+        top_idx = top_idx[np.lexsort((top_idx, -abs_values[top_idx]))]
         
         # Get top factors
         top_factors = []
-        total_impact = sum(abs(v) for v in importance.values())
+        total_impact = abs_values.sum()
+        row = X.iloc[0]
         
-        for feature, value in list(sorted_importance.items())[:5]:
-            impact_pct = abs(value) / total_impact * 100 if total_impact > 0 else 0
+        for i in top_idx:
+            feature = feature_names[i]
+            value = importance[feature]
+            impact_pct = abs_values[i] / total_impact * 100 if total_impact > 0 else 0
             direction = "increases" if value > 0 else "decreases"
             
             top_factors.append({
@@ -66,18 +57,20 @@ class ModelExplainer:
                 'impact': float(value),
                 'impact_percentage': float(impact_pct),
                 'direction': direction,
-                'description': self._get_feature_description(feature, value, X.iloc[0])
+                'description': self._get_feature_description(feature, value, row)
             })
         
         return {
             'shap_values': importance,
             'top_factors': top_factors,
-            'base_value': float(self.explainer.expected_value) if hasattr(self.explainer, 'expected_value') else 0
+            'base_value': float(base_value)
         }
     
     def _get_feature_description(self, feature: str, shap_value: float, row: pd.Series) -> str:
         """Generate human-readable description for a feature"""
         feature_value = row.get(feature, 'N/A')
+        if isinstance(feature_value, (float, np.floating)) and float(feature_value).is_integer():
+            feature_value = int(feature_value)
         direction = "increases" if shap_value > 0 else "decreases"
         
         descriptions = {
@@ -97,30 +90,44 @@ class ModelExplainer:
         return descriptions.get(feature, f"{feature} = {feature_value} {direction} the price")
 
 
-def get_similar_properties(X_train: pd.DataFrame, y_train: pd.Series, 
-                          input_features: pd.DataFrame, n_similar: int = 5) -> List[Dict]:
-    """Find similar properties from training data"""
-    from sklearn.preprocessing import StandardScaler
-    from sklearn.neighbors import NearestNeighbors
+class SimilarityIndex:
+    """Scaled nearest-neighbour index over the training data, fitted once"""
     
-    # Standardize features
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X_train)
-    input_scaled = scaler.transform(input_features)
-    
-    # Find nearest neighbors
-    nn = NearestNeighbors(n_neighbors=min(n_similar, len(X_train)))
-    nn.fit(X_scaled)
+    def __init__(self, X_train: pd.DataFrame, y_train: pd.Series):
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.neighbors import NearestNeighbors
+        
+        self.X_train = X_train
+        self.prices = y_train.to_numpy(dtype=float)
+        
+        # Standardize features
+        self.scaler = StandardScaler()
+        X_scaled = self.scaler.fit_transform(X_train)
+        
+        self.nn = NearestNeighbors()
+        self.nn.fit(X_scaled)
     
-    distances, indices = nn.kneighbors(input_scaled)
+    def query(self, input_features: pd.DataFrame, n_similar: int = 5):
+        """Return (distances, indices) of the nearest training rows"""
+        input_scaled = self.scaler.transform(input_features[self.X_train.columns])
+        distances, indices = self.nn.kneighbors(
+            input_scaled, n_neighbors=min(n_similar, len(self.X_train))
+        )
+        return distances[0], indices[0]
+
+
+def get_similar_properties(index: SimilarityIndex, input_features: pd.DataFrame,
+                           n_similar: int = 5) -> List[Dict]:
+    """Find similar properties from training data"""
+    distances, indices = index.query(input_features, n_similar)
     
     similar = []
-    for i, (dist, idx) in enumerate(zip(distances[0], indices[0])):
+    for i, (dist, idx) in enumerate(zip(distances, indices)):
         similar.append({
             'rank': i + 1,
-            'price': float(y_train.iloc[idx]),
+            'price': float(index.prices[idx]),
             'similarity_score': float(1 / (1 + dist)),  # Convert distance to similarity
-            'features': X_train.iloc[idx].to_dict()
+            'features': index.X_train.iloc[idx].to_dict()
         })
     
     return similar
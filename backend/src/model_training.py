@@ -3,19 +3,19 @@ Model Training Module
 Trains XGBoost, LightGBM models and creates an ensemble
 """
 
+import os
 import pandas as pd
 import numpy as np
 from pathlib import Path
-import joblib
 import json
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.ensemble import StackingRegressor
-from sklearn.linear_model import Ridge
 
 from xgboost import XGBRegressor
+import lightgbm as lgb
 from lightgbm import LGBMRegressor
 # Note: CatBoost removed - requires Visual Studio to build
 
@@ -29,12 +29,15 @@ class HousePriceModel:
     def __init__(self):
         self.models = {}
         self.weights = {}
+        self.weights_vec = None
         self.feature_names = None
         self.metrics = {}
         self.is_trained = False
         
     def _create_base_models(self):
         """Create base models for ensemble"""
+        # The models are fitted concurrently, so split the cores between them
+        n_jobs = max(1, (os.cpu_count() or 1) // 2)
         models = {
             'xgboost': XGBRegressor(
                 n_estimators=500,
@@ -42,6 +45,9 @@ class HousePriceModel:
                 learning_rate=0.05,
                 subsample=0.8,
                 colsample_bytree=0.8,
+                tree_method='hist',
+                max_bin=256,
+                n_jobs=n_jobs,
                 random_state=42,
                 verbosity=0
             ),
@@ -51,6 +57,8 @@ class HousePriceModel:
                 learning_rate=0.05,
                 subsample=0.8,
                 colsample_bytree=0.8,
+                n_jobs=n_jobs,
+                force_col_wise=True,
                 random_state=42,
                 verbose=-1
             )
@@ -74,13 +82,21 @@ class HousePriceModel:
         # Train individual models and collect metrics
         model_metrics = {}
         model_r2_scores = {}
+        test_preds = []
+        
+        # Fit all models concurrently (the native fit code releases the GIL)
+        print(f"  Training {', '.join(self.models)}...")
+        with ThreadPoolExecutor(max_workers=len(self.models)) as executor:
+            futures = [executor.submit(model.fit, X_train, y_train) for model in self.models.values()]
+            for future in futures:
+                future.result()
         
         for name, model in self.models.items():
-            print(f"  Training {name}...")
-            model.fit(X_train, y_train)
+            print(f"  Evaluating {name}...")
             
             # Evaluate
             y_pred = model.predict(X_test)
+            test_preds.append(y_pred)
             metrics = self._calculate_metrics(y_test, y_pred)
             model_metrics[name] = metrics
             model_r2_scores[name] = metrics['r2']
@@ -89,13 +105,12 @@ class HousePriceModel:
         # Calculate weights based on R² scores (higher R² = higher weight)
         total_r2 = sum(model_r2_scores.values())
         self.weights = {name: r2 / total_r2 for name, r2 in model_r2_scores.items()}
+        self._set_weights_vec()
         print(f"  Model weights: {self.weights}")
         
-        # Ensemble prediction (weighted average)
+        # Ensemble prediction (weighted average of the stacked test predictions)
         print("  Creating weighted ensemble...")
-        y_pred_ensemble = np.zeros(len(y_test))
-        for name, model in self.models.items():
-            y_pred_ensemble += self.weights[name] * model.predict(X_test)
+        y_pred_ensemble = self._weighted_sum(np.vstack(test_preds))
         
         ensemble_metrics = self._calculate_metrics(y_test, y_pred_ensemble)
         model_metrics['ensemble'] = ensemble_metrics
@@ -113,6 +128,16 @@ class HousePriceModel:
         self.is_trained = True
         return self.metrics
     
+    def _set_weights_vec(self):
+        """Cache the ensemble weights as a vector in self.models order"""
+        self.weights_vec = np.array([self.weights[name] for name in self.models])
+    
+    def _weighted_sum(self, pred_values: np.ndarray) -> np.ndarray:
+        """Weighted ensemble of stacked (n_models, n_samples) predictions"""
+        # Broadcast multiply + column sum rather than a BLAS matvec, so each row's
+        # result doesn't depend on how many rows are predicted together
+        return (self.weights_vec[:, None] * pred_values).sum(axis=0)
+    
     def _calculate_metrics(self, y_true, y_pred):
         """Calculate regression metrics"""
         return {
@@ -122,88 +147,123 @@ class HousePriceModel:
             'mape': float(np.mean(np.abs((y_true - y_pred) / y_true)) * 100)
         }
     
-    def predict(self, X: pd.DataFrame) -> dict:
-        """Make predictions with confidence intervals"""
+    def predict(self, X) -> dict:
+        """Make a prediction with confidence interval for the first row of X"""
+        return self.predict_batch(X[:1])[0]
+    
+    def predict_batch(self, X) -> list:
+        """Make predictions with confidence intervals for every row of X"""
         if not self.is_trained:
             raise ValueError("Model not trained yet!")
         
-        # Ensure correct feature order
-        X = X[self.feature_names]
+        # Ensure correct feature order, filling missing features with 0 in one pass
+        # (NumPy rows are already in model order)
+        if isinstance(X, pd.DataFrame):
+            X = X.reindex(columns=self.feature_names, fill_value=0).astype(np.float32, copy=False)
         
-        # Get predictions from all models
-        predictions = {}
-        for name, model in self.models.items():
-            predictions[name] = model.predict(X)[0]
+        # Stack predictions from all models into (n_models, n_samples)
+        pred_values = np.vstack([model.predict(X) for model in self.models.values()])
         
         # Weighted average ensemble prediction
-        ensemble_pred = sum(self.weights[name] * pred for name, pred in predictions.items())
+        ensemble_pred = self._weighted_sum(pred_values)
         
         # Calculate confidence interval (based on model variance)
-        pred_values = list(predictions.values())
-        mean_pred = np.mean(pred_values)
-        std_pred = np.std(pred_values)
+        mean_pred = pred_values.mean(axis=0)
+        std_pred = pred_values.std(axis=0)
         
         # 95% confidence interval
         confidence_margin = 1.96 * std_pred
-        lower_bound = max(0, ensemble_pred - confidence_margin)
+        lower_bound = np.maximum(0, ensemble_pred - confidence_margin)
         upper_bound = ensemble_pred + confidence_margin
         
-        return {
-            'predicted_price': float(ensemble_pred),
-            'price_lower': float(lower_bound),
-            'price_upper': float(upper_bound),
-            'confidence': float(1 - (std_pred / mean_pred)) if mean_pred > 0 else 0.8,
-            'model_predictions': {k: float(v) for k, v in predictions.items()}
-        }
+        return [
+            {
+                'predicted_price': float(ensemble_pred[i]),
+                'price_lower': float(lower_bound[i]),
+                'price_upper': float(upper_bound[i]),
+                'confidence': float(1 - (std_pred[i] / mean_pred[i])) if mean_pred[i] > 0 else 0.8,
+                'model_predictions': {name: float(v[i]) for name, v in zip(self.models, pred_values)}
+            }
+            for i in range(len(ensemble_pred))
+        ]
     
     def get_feature_importance(self) -> dict:
         """Get feature importance from all models"""
         if not self.is_trained:
             return {}
         
-        importance = {}
-        
-        # XGBoost importance
-        xgb_imp = self.models['xgboost'].feature_importances_
-        importance['xgboost'] = dict(zip(self.feature_names, xgb_imp.tolist()))
-        
-        # LightGBM importance
-        lgb_imp = self.models['lightgbm'].feature_importances_
-        importance['lightgbm'] = dict(zip(self.feature_names, lgb_imp.tolist()))
-        
-        # CatBoost importance
-        cat_imp = self.models['catboost'].feature_importances_
-        importance['catboost'] = dict(zip(self.feature_names, cat_imp.tolist()))
+        # Per-model importances, in self.models order
+        importances = [model.feature_importances_ for model in self.models.values()]
+        importance = {
+            name: dict(zip(self.feature_names, imp.tolist()))
+            for name, imp in zip(self.models, importances)
+        }
         
-        # Average importance
-        avg_imp = (xgb_imp + lgb_imp + cat_imp) / 3
+        # Average importance across models, as one stacked mean
+        avg_imp = np.stack(importances).mean(axis=0)
         importance['average'] = dict(zip(self.feature_names, avg_imp.tolist()))
         
         return importance
     
     def save(self, filepath: str):
-        """Save the trained model"""
+        """Save the trained model: native booster files plus a JSON metadata file"""
+        filepath = Path(filepath)
+        xgb_path = filepath.with_suffix('.xgboost.ubj')
+        lgb_path = filepath.with_suffix('.lightgbm.txt')
+        
+        self.models['xgboost'].save_model(str(xgb_path))
+        self.models['lightgbm'].booster_.save_model(str(lgb_path))
+        
         save_data = {
-            'models': self.models,
+            'model_files': {'xgboost': xgb_path.name, 'lightgbm': lgb_path.name},
             'weights': self.weights,
             'feature_names': self.feature_names,
             'metrics': self.metrics,
             'is_trained': self.is_trained
         }
-        joblib.dump(save_data, filepath)
+        with open(filepath, 'w') as f:
+            json.dump(save_data, f, indent=2)
         print(f"Model saved to {filepath}")
     
     def load(self, filepath: str):
-        """Load a trained model"""
-        save_data = joblib.load(filepath)
-        self.models = save_data['models']
+        """Load a trained model saved by save()"""
+        filepath = Path(filepath)
+        with open(filepath) as f:
+            save_data = json.load(f)
+        model_files = save_data['model_files']
+        
+        xgb_model = XGBRegressor()
+        xgb_model.load_model(str(filepath.parent / model_files['xgboost']))
+        
+        lgb_booster = lgb.Booster(model_file=str(filepath.parent / model_files['lightgbm']))
+        
+        self.models = {
+            'xgboost': xgb_model,
+            'lightgbm': LGBMBoosterModel(lgb_booster)
+        }
         self.weights = save_data['weights']
         self.feature_names = save_data['feature_names']
         self.metrics = save_data['metrics']
         self.is_trained = save_data['is_trained']
+        self._set_weights_vec()
         print(f"Model loaded from {filepath}")
 
 
+class LGBMBoosterModel:
+    """Adapter giving a loaded LightGBM Booster the estimator interface the ensemble uses"""
+    
+    def __init__(self, booster):
+        self.booster_ = booster
+    
+    def predict(self, X) -> np.ndarray:
+        return self.booster_.predict(X)
+    
+    @property
+    def feature_importances_(self) -> np.ndarray:
+        # Split counts, matching LGBMRegressor's default importance_type
+        return self.booster_.feature_importance(importance_type='split')
+
+
 def train_and_save_model(housing_path: str, model_save_path: str):
     """Complete training pipeline"""
     from data_processing import prepare_training_data
@@ -234,7 +294,7 @@ def train_and_save_model(housing_path: str, model_save_path: str):
 if __name__ == "__main__":
     base_path = Path(__file__).parent.parent
     housing_path = base_path.parent / "Housing (1).csv"
-    model_save_path = base_path / "models" / "house_price_model.joblib"
+    model_save_path = base_path / "models" / "house_price_model.json"
     
     # Create models directory
     model_save_path.parent.mkdir(parents=True, exist_ok=True)